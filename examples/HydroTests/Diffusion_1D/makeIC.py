@@ -40,10 +40,10 @@ def get_particle_u(low: float, high: float, n_part: int) -> np.array:
     and high. Make sure n_part is even.
     """
 
-    indicies = np.arange(n_part)
-    u = unyt.unyt_array(np.empty(n_part, dtype=float), low.units)
-    u[...] = low
-    u[(indicies % 2).astype(bool)] = high
+    odd = np.arange(n_part) % 2 == 1
+    u = unyt.unyt_array(
+        np.where(odd, high.to(low.units).value, low.value), low.units
+    )
 
     return u
 
@@ -53,8 +53,7 @@ def get_particle_masses(mass: float, n_part: int) -> np.array:
     Gets the particle masses.
     """
 
-    m = unyt.unyt_array(np.empty(n_part, dtype=float), mass.units)
-    m[...] = mass
+    m = unyt.unyt_array(np.full(n_part, mass.value, dtype=float), mass.units)
 
     return m
 
@@ -65,8 +64,7 @@ def get_particle_hsml(box_length: float, n_part: int) -> np.array:
     """
 
     mips = box_length / float(n_part)
-    hsml = unyt.unyt_array(np.empty(n_part, dtype=float), box_length.units)
-    hsml[...] = mips
+    hsml = unyt.unyt_array(np.full(n_part, mips.value, dtype=float), mips.units)
 
     return hsml
 
@@ -12,6 +12,8 @@ import h5py
 import os.path
 import numpy as np
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Number of snapshots and elements
 newest_snap_name = max(glob.glob('stellar_evolution_*.hdf5'), key=os.path.getctime)
@@ -76,26 +78,46 @@ const_solar_mass = 1.98848e33 / unit_mass_in_cgs
 # Define Gyr
 Gyr_in_cgs = 1e9 * 365 * 24 * 3600.
 
-# Find out how many particles (gas and star) we have
+# Find out how many gas particles we have
 n_parts = sim["/Header"].attrs["NumPart_Total"][0]
-n_sparts = sim["/Header"].attrs["NumPart_Total"][4]
 
 # Declare arrays for data
-masses = zeros((n_parts,n_snapshots))
-star_masses = zeros((n_sparts,n_snapshots))
-internal_energy = zeros((n_parts,n_snapshots))
-velocity_parts = zeros((n_parts,3,n_snapshots))
+total_energy = zeros(n_snapshots)
+total_kinetic_energy = zeros(n_snapshots)
 time = zeros(n_snapshots)
 
-# Read fields we are checking from snapshots
-#for i in [0,n_snapshots-1]:
-for i in range(n_snapshots):
-	sim = h5py.File("stellar_evolution_%04d.hdf5"%i, "r")
-	print('reading snapshot '+str(i))
-	masses[:,i] = sim["/PartType0/Masses"]
-	internal_energy[:,i] = sim["/PartType0/InternalEnergy"]
-	velocity_parts[:,:,i] = sim["/PartType0/Velocities"]
-	time[i] = sim["/Header"].attrs["Time"][0]
+# Buffers reused for every snapshot read, one set per reading thread
+buffers = threading.local()
+
+# Read the fields we are checking from one snapshot and reduce them to
+# the total internal and kinetic energy of the gas
+def read_snapshot(i):
+	if not hasattr(buffers, "masses"):
+		buffers.masses = np.empty(n_parts)
+		buffers.internal_energy = np.empty(n_parts)
+		buffers.velocities = np.empty((n_parts,3))
+	masses = buffers.masses
+	internal_energy = buffers.internal_energy
+	velocities = buffers.velocities
+
+	with h5py.File("stellar_evolution_%04d.hdf5"%i, "r") as sim:
+		sim["/PartType0/Masses"].read_direct(masses)
+		sim["/PartType0/InternalEnergy"].read_direct(internal_energy)
+		sim["/PartType0/Velocities"].read_direct(velocities)
+		t = sim["/Header"].attrs["Time"][0]
+
+	energy = np.dot(masses, internal_energy)
+	kinetic_energy = 0.5 * np.einsum('i,ij,ij->', masses, velocities, velocities)
+	return energy, kinetic_energy, t
+
+# Read the snapshots concurrently so that the file reads overlap, keeping
+# only the totals
+with ThreadPoolExecutor(max_workers=8) as pool:
+	for i, (energy, kinetic_energy, t) in enumerate(pool.map(read_snapshot, range(n_snapshots))):
+		print('read snapshot '+str(i))
+		total_energy[i] = energy
+		total_kinetic_energy[i] = kinetic_energy
+		time[i] = t
 
 # Check that the total amount of enrichment is as expected.
 # Define tolerance. Note, relatively high value used due to
@@ -103,10 +125,8 @@ for i in range(n_snapshots):
 eps = 0.15
 
 # Stochastic heating
-vel2 = zeros((n_parts,n_snapshots))
-vel2[:,:] = velocity_parts[:,0,:]*velocity_parts[:,0,:] + velocity_parts[:,1,:]*velocity_parts[:,1,:] + velocity_parts[:,2,:]*velocity_parts[:,2,:]
-total_kinetic_energy_cgs = np.sum(np.multiply(vel2,masses)*0.5,axis = 0) * unit_energy_in_cgs
-total_energy_cgs = np.sum(np.multiply(internal_energy,masses),axis = 0) * unit_energy_in_cgs
+total_kinetic_energy_cgs = total_kinetic_energy * unit_energy_in_cgs
+total_energy_cgs = total_energy * unit_energy_in_cgs
 total_energy_released_cgs = total_energy_cgs[n_snapshots-1] - total_energy_cgs[0] + total_kinetic_energy_cgs[n_snapshots-1] - total_kinetic_energy_cgs[0]
 
 # Calculate energy released
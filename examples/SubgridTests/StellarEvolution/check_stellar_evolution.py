@@ -5,6 +5,7 @@ import h5py
 import os.path
 import numpy as np
 import glob
+from make_virtual_snapshots import make_virtual_snapshots
 
 # Number of snapshots and elements
 newest_snap_name = max(glob.glob('stellar_evolution_*.hdf5'), key=os.path.getctime)
@@ -67,42 +68,36 @@ unit_time_in_si = unit_time_in_cgs
 n_parts = sim["/Header"].attrs["NumPart_Total"][0]
 n_sparts = sim["/Header"].attrs["NumPart_Total"][4]
 
-# Declare arrays for data
-masses = zeros((n_parts,n_snapshots))
-star_masses = zeros((n_sparts,n_snapshots))
-mass_from_AGB = zeros((n_parts,n_snapshots))
-metal_mass_frac_from_AGB = zeros((n_parts,n_snapshots))
-mass_from_SNII = zeros((n_parts,n_snapshots))
-metal_mass_frac_from_SNII = zeros((n_parts,n_snapshots))
-mass_from_SNIa = zeros((n_parts,n_snapshots))
-metal_mass_frac_from_SNIa = zeros((n_parts,n_snapshots))
-iron_mass_frac_from_SNIa = zeros((n_parts,n_snapshots))
-metallicity = zeros((n_parts,n_snapshots))
-abundances = zeros((n_parts,n_elements,n_snapshots))
-internal_energy = zeros((n_parts,n_snapshots))
-coord_parts = zeros((n_parts,3))
-velocity_parts = zeros((n_parts,3,n_snapshots))
-coord_sparts = zeros(3)
+# Declare arrays for data, stored snapshot-major as in the virtual datasets
+masses = zeros((n_snapshots,n_parts))
+star_masses = zeros((n_snapshots,n_sparts))
+mass_from_AGB = zeros((n_snapshots,n_parts))
+metal_mass_frac_from_AGB = zeros((n_snapshots,n_parts))
+mass_from_SNII = zeros((n_snapshots,n_parts))
+metal_mass_frac_from_SNII = zeros((n_snapshots,n_parts))
+mass_from_SNIa = zeros((n_snapshots,n_parts))
+metal_mass_frac_from_SNIa = zeros((n_snapshots,n_parts))
+iron_mass_frac_from_SNIa = zeros((n_snapshots,n_parts))
+metallicity = zeros((n_snapshots,n_parts))
+abundances = zeros((n_snapshots,n_parts,n_elements))
 time = zeros(n_snapshots)
 
-# Read fields we are checking from snapshots
-for i in range(n_snapshots):
-	sim = h5py.File("stellar_evolution_%04d.hdf5"%i, "r")
-	print('reading snapshot '+str(i))
-	abundances[:,:,i] = sim["/PartType0/ElementAbundance"]
-	metallicity[:,i] = sim["/PartType0/Metallicity"]
-	masses[:,i] = sim["/PartType0/Masses"]
-	star_masses[:,i] = sim["/PartType4/Masses"]
-	mass_from_AGB[:,i] = sim["/PartType0/TotalMassFromAGB"]
-	metal_mass_frac_from_AGB[:,i] = sim["/PartType0/MetalMassFracFromAGB"]
-	mass_from_SNII[:,i] = sim["/PartType0/TotalMassFromSNII"]
-	metal_mass_frac_from_SNII[:,i] = sim["/PartType0/MetalMassFracFromSNII"]
-	mass_from_SNIa[:,i] = sim["/PartType0/TotalMassFromSNIa"]
-	metal_mass_frac_from_SNIa[:,i] = sim["/PartType0/MetalMassFracFromSNIa"]
-	iron_mass_frac_from_SNIa[:,i] = sim["/PartType0/IronMassFracFromSNIa"]
-	internal_energy[:,i] = sim["/PartType0/InternalEnergy"]
-	velocity_parts[:,:,i] = sim["/PartType0/Velocities"]
-	time[i] = sim["/Header"].attrs["Time"][0]
+# Read fields we are checking from all the snapshots at once, through
+# a file of virtual datasets that combines them
+sim = h5py.File(make_virtual_snapshots(n_snapshots), "r")
+sim["/PartType0/ElementAbundance"].read_direct(abundances)
+sim["/PartType0/Metallicity"].read_direct(metallicity)
+sim["/PartType0/Masses"].read_direct(masses)
+sim["/PartType4/Masses"].read_direct(star_masses)
+sim["/PartType0/TotalMassFromAGB"].read_direct(mass_from_AGB)
+sim["/PartType0/MetalMassFracFromAGB"].read_direct(metal_mass_frac_from_AGB)
+sim["/PartType0/TotalMassFromSNII"].read_direct(mass_from_SNII)
+sim["/PartType0/MetalMassFracFromSNII"].read_direct(metal_mass_frac_from_SNII)
+sim["/PartType0/TotalMassFromSNIa"].read_direct(mass_from_SNIa)
+sim["/PartType0/MetalMassFracFromSNIa"].read_direct(metal_mass_frac_from_SNIa)
+sim["/PartType0/IronMassFracFromSNIa"].read_direct(iron_mass_frac_from_SNIa)
+sim["/Header/Time"].read_direct(time)
+sim.close()
 
 # Define ejecta factor
 ejecta_factor = 1.0e-2
@@ -116,21 +111,21 @@ energy_per_SNe = 1.0e51/unit_energy_in_cgs
 eps = 0.01
 
 # Total mass
-total_part_mass = np.sum(masses,axis = 0)
+total_part_mass = np.sum(masses,axis = 1)
 if abs((total_part_mass[n_snapshots-1] - total_part_mass[0])/total_part_mass[0] - ejected_mass/total_part_mass[0])*total_part_mass[0]/ejected_mass < eps:
 	print("total mass released consistent with expectation")
 else:
 	print("mass increase "+str(total_part_mass[n_snapshots-1]/total_part_mass[0])+" expected "+ str(1.0+ejected_mass/total_part_mass[0]))
 
 # Check that mass is conserved (i.e. total star mass decreases by same amount as total gas mass increases)
-total_spart_mass = np.sum(star_masses,axis = 0)
+total_spart_mass = np.sum(star_masses,axis = 1)
 if abs((total_part_mass[n_snapshots-1] + total_spart_mass[n_snapshots-1]) / (total_part_mass[0] + total_spart_mass[0]) - 1.0) < eps**3:
 	print("total mass conserved")
 else:
 	print("initial part, spart mass " + str(total_part_mass[0]) + " " + str(total_spart_mass[0]) + " final mass " + str(total_part_mass[n_snapshots-1]) + " " + str(total_spart_mass[n_snapshots-1]))
 
 # Total metal mass from AGB
-total_metal_mass_AGB = np.sum(np.multiply(metal_mass_frac_from_AGB,masses),axis = 0)
+total_metal_mass_AGB = np.einsum('ij,ij->i',metal_mass_frac_from_AGB,masses)
 expected_metal_mass_AGB = ejecta_factor*ejected_mass
 if abs(total_metal_mass_AGB[n_snapshots-1] - expected_metal_mass_AGB)/expected_metal_mass_AGB < eps:
 	print("total AGB metal mass released consistent with expectation")
@@ -138,7 +133,7 @@ else:
 	print("total AGB metal mass "+str(total_metal_mass_AGB[n_snapshots-1])+" expected "+ str(expected_metal_mass_AGB))
 
 # Total mass from AGB
-total_AGB_mass = np.sum(mass_from_AGB,axis = 0)
+total_AGB_mass = np.sum(mass_from_AGB,axis = 1)
 expected_AGB_mass = ejecta_factor*ejected_mass
 if abs(total_AGB_mass[n_snapshots-1] - expected_AGB_mass)/expected_AGB_mass < eps:
 	print("total AGB mass released consistent with expectation")
@@ -146,7 +141,7 @@ else:
 	print("total AGB mass "+str(total_AGB_mass[n_snapshots-1])+" expected "+ str(expected_AGB_mass))
 
 # Total metal mass from SNII
-total_metal_mass_SNII = np.sum(np.multiply(metal_mass_frac_from_SNII,masses),axis = 0)
+total_metal_mass_SNII = np.einsum('ij,ij->i',metal_mass_frac_from_SNII,masses)
 expected_metal_mass_SNII = ejecta_factor*ejected_mass
 if abs(total_metal_mass_SNII[n_snapshots-1] - expected_metal_mass_SNII)/expected_metal_mass_SNII < eps:
 	print("total SNII metal mass released consistent with expectation")
@@ -154,7 +149,7 @@ else:
 	print("total SNII metal mass "+str(total_metal_mass_SNII[n_snapshots-1])+" expected "+ str(expected_metal_mass_SNII))
 
 # Total mass from SNII
-total_SNII_mass = np.sum(mass_from_SNII,axis = 0)
+total_SNII_mass = np.sum(mass_from_SNII,axis = 1)
 expected_SNII_mass = ejecta_factor*ejected_mass
 if abs(total_SNII_mass[n_snapshots-1] - expected_SNII_mass)/expected_SNII_mass < eps:
 	print("total SNII mass released consistent with expectation")
@@ -162,7 +157,7 @@ else:
 	print("total SNII mass "+str(total_SNII_mass[n_snapshots-1])+" expected "+ str(expected_SNII_mass))
 
 # Total metal mass from SNIa
-total_metal_mass_SNIa = np.sum(np.multiply(metal_mass_frac_from_SNIa,masses),axis = 0)
+total_metal_mass_SNIa = np.einsum('ij,ij->i',metal_mass_frac_from_SNIa,masses)
 expected_metal_mass_SNIa = ejecta_factor*ejected_mass
 if abs(total_metal_mass_SNIa[n_snapshots-1] - expected_metal_mass_SNIa)/expected_metal_mass_SNIa < eps:
 	print("total SNIa metal mass released consistent with expectation")
@@ -170,7 +165,7 @@ else:
 	print("total SNIa metal mass "+str(total_metal_mass_SNIa[n_snapshots-1])+" expected "+ str(expected_metal_mass_SNIa))
 
 # Total iron mass from SNIa
-total_iron_mass_SNIa = np.sum(np.multiply(iron_mass_frac_from_SNIa,masses),axis = 0)
+total_iron_mass_SNIa = np.einsum('ij,ij->i',iron_mass_frac_from_SNIa,masses)
 expected_iron_mass_SNIa = ejecta_factor*ejected_mass
 if abs(total_iron_mass_SNIa[n_snapshots-1] - expected_iron_mass_SNIa)/expected_iron_mass_SNIa < eps:
 	print("total SNIa iron mass released consistent with expectation")
@@ -178,7 +173,7 @@ else:
 	print("total SNIa iron mass "+str(total_iron_mass_SNIa[n_snapshots-1])+" expected "+ str(expected_iron_mass_SNIa))
 
 # Total mass from SNIa
-total_SNIa_mass = np.sum(mass_from_SNIa,axis = 0)
+total_SNIa_mass = np.sum(mass_from_SNIa,axis = 1)
 expected_SNIa_mass = ejecta_factor*ejected_mass
 if abs(total_SNIa_mass[n_snapshots-1] - expected_SNIa_mass)/expected_SNIa_mass < eps:
 	print("total SNIa mass released consistent with expectation")
@@ -186,7 +181,7 @@ else:
 	print("total SNIa mass "+str(total_SNIa_mass[n_snapshots-1])+" expected "+ str(expected_SNIa_mass))
 
 # Total metal mass
-total_metal_mass = np.sum(np.multiply(metallicity,masses),axis = 0)
+total_metal_mass = np.einsum('ij,ij->i',metallicity,masses)
 expected_metal_mass = ejecta_factor_metallicity*ejected_mass
 if abs(total_metal_mass[n_snapshots-1] - expected_metal_mass)/expected_metal_mass < eps:
 	print("total metal mass released consistent with expectation")
@@ -196,7 +191,7 @@ else:
 # Total mass for each element
 expected_element_mass = ejecta_factor_abundances*ejected_mass
 for i in range(n_elements):
-	total_element_mass = np.sum(np.multiply(abundances[:,i,:],masses),axis = 0)
+	total_element_mass = np.einsum('ij,ij->i',abundances[:,:,i],masses)
 	if abs(total_element_mass[n_snapshots-1] - expected_element_mass)/expected_element_mass < eps:
 		print("total element mass released consistent with expectation for element "+str(i))
 	else:
@@ -0,0 +1,58 @@
+# Script used to combine the snapshots of a run into a single file of HDF5
+# virtual datasets. Each particle field of the snapshots is presented as one
+# dataset of shape (n_snapshots, n_parts, ...), so that its whole evolution
+# can be read with a single call instead of opening every snapshot. The
+# snapshot times are copied into /Header/Time. Requires HDF5 1.10 or later.
+
+import h5py
+import glob
+import os.path
+
+# Particle fields to combine
+fields = ["/PartType0/Masses",
+	"/PartType0/Metallicity",
+	"/PartType0/ElementAbundance",
+	"/PartType0/TotalMassFromAGB",
+	"/PartType0/MetalMassFracFromAGB",
+	"/PartType0/TotalMassFromSNII",
+	"/PartType0/MetalMassFracFromSNII",
+	"/PartType0/TotalMassFromSNIa",
+	"/PartType0/MetalMassFracFromSNIa",
+	"/PartType0/IronMassFracFromSNIa",
+	"/PartType4/Masses"]
+
+def make_virtual_snapshots(n_snapshots, output="virtual_stellar_evolution.hdf5"):
+	snapshots = ["stellar_evolution_%04d.hdf5"%i for i in range(n_snapshots)]
+
+	# Nothing to do if the file has all the fields, covers the same
+	# snapshots and is newer than all of them
+	if os.path.exists(output) and os.path.getmtime(output) > max(os.path.getmtime(s) for s in snapshots):
+		with h5py.File(output, "r") as f:
+			if all(field in f for field in fields) and f["/Header/Time"].shape[0] == n_snapshots:
+				return output
+
+	# Build into a temporary file and only move it into place once it is
+	# complete, so an interrupted build is never mistaken for a valid file
+	tmp_output = output + ".tmp"
+	with h5py.File(tmp_output, "w") as f:
+		time = f.create_dataset("/Header/Time", (n_snapshots,), "d")
+		for i in range(n_snapshots):
+			with h5py.File(snapshots[i], "r") as sim:
+				time[i] = sim["/Header"].attrs["Time"][0]
+				if i == 0:
+					layouts = {}
+					for field in fields:
+						layouts[field] = h5py.VirtualLayout((n_snapshots,) + sim[field].shape, sim[field].dtype)
+				for field in fields:
+					layouts[field][i] = h5py.VirtualSource(sim[field])
+
+		for field in fields:
+			f.create_virtual_dataset(field, layouts[field])
+	os.replace(tmp_output, output)
+
+	return output
+
+if __name__ == "__main__":
+	newest_snap_name = max(glob.glob('stellar_evolution_*.hdf5'), key=os.path.getctime)
+	n_snapshots = int(newest_snap_name.replace('stellar_evolution_','').replace('.hdf5','')) + 1
+	print("written " + make_virtual_snapshots(n_snapshots))
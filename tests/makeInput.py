@@ -41,36 +41,16 @@ internalEnergy = P / ((gamma - 1.)*rho)
 he_density = rho * 0.24
 
 #Generate particles
-coords = zeros((numPart, 3))
+i, j, k = indices((L, L, L))
+coords = (stack([i, j, k], axis=-1).reshape(-1, 3) + 0.5) * (boxSize / L)
 v      = zeros((numPart, 3))
-m      = zeros((numPart, 1))
-h      = zeros((numPart, 1))
-u      = zeros((numPart, 1))
-ids    = zeros((numPart, 1), dtype='L')
+m      = full((numPart, 1), mass)
+h      = full((numPart, 1), 2.251 * boxSize / L)
+u      = full((numPart, 1), internalEnergy)
+ids    = arange(numPart, dtype='L').reshape(numPart, 1)
 
 # chemistry data
-he = zeros((numPart, 1))
-
-for i in range(L):
-    for j in range(L):
-        for k in range(L):
-            index = i*L*L + j*L + k
-            x = i * boxSize / L + boxSize / (2*L)
-            y = j * boxSize / L + boxSize / (2*L)
-            z = k * boxSize / L + boxSize / (2*L)
-            coords[index,0] = x
-            coords[index,1] = y
-            coords[index,2] = z
-            v[index,0] = 0.
-            v[index,1] = 0.
-            v[index,2] = 0.
-            m[index] = mass
-            h[index] = 2.251 * boxSize / L
-            u[index] = internalEnergy
-            ids[index] = index
-            # chemistry data
-            he[index] = he_density
-            
+he = full((numPart, 1), he_density)
 
 #--------------------------------------------------
 
@@ -102,22 +82,23 @@ grp.attrs["Unit current in cgs (U_I)"] = 1.
 grp.attrs["Unit temperature in cgs (U_T)"] = 1.
 
 
-#Particle group
+#Particle group, written in compressed chunks of whole particle rows
+chunkSize = numPart if numPart < 8192 else 8192
 grp = file.create_group("/PartType0")
-ds = grp.create_dataset('Coordinates', (numPart, 3), 'd')
-ds[()] = coords
-ds = grp.create_dataset('Velocities', (numPart, 3), 'f')
-ds[()] = v
-ds = grp.create_dataset('Masses', (numPart,1), 'f')
-ds[()] = m
-ds = grp.create_dataset('SmoothingLength', (numPart,1), 'f')
-ds[()] = h
-ds = grp.create_dataset('InternalEnergy', (numPart,1), 'f')
-ds[()] = u
-ds = grp.create_dataset('ParticleIDs', (numPart, 1), 'L')
-ds[()] = ids
+grp.create_dataset('Coordinates', data=coords, dtype='d', chunks=(chunkSize, 3),
+                   compression="gzip", shuffle=True)
+grp.create_dataset('Velocities', data=v, dtype='f', chunks=(chunkSize, 3),
+                   compression="gzip", shuffle=True)
+grp.create_dataset('Masses', data=m, dtype='f', chunks=(chunkSize, 1),
+                   compression="gzip", shuffle=True)
+grp.create_dataset('SmoothingLength', data=h, dtype='f', chunks=(chunkSize, 1),
+                   compression="gzip", shuffle=True)
+grp.create_dataset('InternalEnergy', data=u, dtype='f', chunks=(chunkSize, 1),
+                   compression="gzip", shuffle=True)
+grp.create_dataset('ParticleIDs', data=ids, dtype='L', chunks=(chunkSize, 1),
+                   compression="gzip", shuffle=True)
 # chemistry
-ds = grp.create_dataset('HeDensity', (numPart, 1), 'f')
-ds[()] = he
+grp.create_dataset('HeDensity', data=he, dtype='f', chunks=(chunkSize, 1),
+                   compression="gzip", shuffle=True)
 
 file.close()
@@ -40,11 +40,6 @@ You should have received a copy of the GNU Lesser General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.collections as collections
-import matplotlib.ticker as plticker
-import pylab as pl
 import sys
 import argparse
 
@@ -126,6 +121,22 @@ if args.ranks != None:
 else:
     ranks = None
 
+#  Only import the plotting and numerical modules once the command line
+#  has been handled, these are slow to load and not needed for --help.
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.collections as collections
+import matplotlib.colors as mcolors
+import matplotlib.ticker as plticker
+import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    import pandas
+    pandasavail = True
+except ImportError:
+    pandasavail = False
+
 #  Basic plot configuration.
 PLOT_PARAMS = {
     "axes.labelsize": 10,
@@ -144,7 +155,7 @@ PLOT_PARAMS = {
     "lines.markersize": 6,
     "lines.linewidth": 3.0,
 }
-pl.rcParams.update(PLOT_PARAMS)
+plt.rcParams.update(PLOT_PARAMS)
 
 #  Tasks and subtypes. Indexed as in tasks.h.
 TASKTYPES = [
@@ -342,16 +353,55 @@ for task in SUBTYPES:
     SUBCOLOURS[task] = colours[ncolours]
     ncolours = (ncolours + 1) % maxcolours
 
+#  Lookup tables of the colour and legend label for every task type and
+#  subtype pair, indexed as [tasktype, subtype]. The colours are also
+#  tabulated as integer indices into colours, and so into their RGBA
+#  values, so that the colours of all the tasks can be looked up without
+#  handling any strings.
+TYPECOLOURS = np.empty((len(TASKTYPES), len(SUBTYPES)), dtype=object)
+TYPECOLOURIDS = np.empty((len(TASKTYPES), len(SUBTYPES)), dtype=int)
+COLOURRGBAS = mcolors.to_rgba_array(colours)
+TYPELABELS = np.empty((len(TASKTYPES), len(SUBTYPES)), dtype=object)
+for i, tasktype in enumerate(TASKTYPES):
+    for j, subtype in enumerate(SUBTYPES):
+        if "fof" in tasktype:
+            TYPECOLOURS[i, j] = TASKCOLOURS[tasktype]
+        elif (
+            "self" in tasktype
+            or "pair" in tasktype
+            or "recv" in tasktype
+            or "send" in tasktype
+        ):
+            fulltype = tasktype + "/" + subtype
+            if fulltype in SUBCOLOURS:
+                TYPECOLOURS[i, j] = SUBCOLOURS[fulltype]
+            else:
+                TYPECOLOURS[i, j] = SUBCOLOURS[subtype]
+        else:
+            TYPECOLOURS[i, j] = TASKCOLOURS[tasktype]
+        TYPECOLOURIDS[i, j] = colours.index(TYPECOLOURS[i, j])
+
+        if subtype != "none":
+            TYPELABELS[i, j] = tasktype + "/" + subtype
+        else:
+            TYPELABELS[i, j] = tasktype
+
 #  For fiddling with colours...
 if args.verbose:
     print("#Selected colours:")
     for task in sorted(TASKCOLOURS.keys()):
-        print(("# " + task + ": " + TASKCOLOURS[task]))
+        print("# " + task + ": " + TASKCOLOURS[task])
     for task in sorted(SUBCOLOURS.keys()):
-        print(("# " + task + ": " + SUBCOLOURS[task]))
-
-#  Read input.
-data = pl.loadtxt(infile)
+        print("# " + task + ": " + SUBCOLOURS[task])
+
+#  Read input. Use the C parser of pandas when we can, it is much faster
+#  than loadtxt for the large files of big steps.
+if pandasavail:
+    data = pandas.read_csv(
+        infile, sep=r"\s+", header=None, dtype=np.float64
+    ).to_numpy()
+else:
+    data = np.loadtxt(infile)
 
 #  Do we have an MPI file?
 full_step = data[0, :]
@@ -360,7 +410,7 @@ if full_step.size == 13:
     mpimode = True
     if ranks == None:
         ranks = list(range(int(max(data[:, 0])) + 1))
-    print(("# Number of ranks:", len(ranks)))
+    print("# Number of ranks:", len(ranks))
     rankcol = 0
     threadscol = 1
     taskcol = 2
@@ -381,24 +431,34 @@ else:
 #  Get CPU_CLOCK to convert ticks into milliseconds.
 CPU_CLOCK = float(full_step[-1]) / 1000.0
 if args.verbose:
-    print(("# CPU frequency:", CPU_CLOCK * 1000.0))
+    print("# CPU frequency:", CPU_CLOCK * 1000.0)
 
 nthread = int(max(data[:, threadscol])) + 1
-print(("# Number of threads:", nthread))
+print("# Number of threads:", nthread)
 
 # Avoid start and end times of zero.
 sdata = data[data[:, ticcol] != 0]
 sdata = sdata[sdata[:, toccol] != 0]
 
+# Split the data into the rows of each rank in a single pass. The sort is
+# stable so the step information stays the first row of each rank.
+rankdata = {}
+if mpimode:
+    sdata = sdata[np.argsort(sdata[:, rankcol], kind="stable")]
+    rankids, offsets = np.unique(sdata[:, rankcol], return_index=True)
+    offsets = np.append(offsets, sdata.shape[0])
+    for i, rank in enumerate(rankids.astype(int)):
+        rankdata[rank] = sdata[offsets[i] : offsets[i + 1]]
+else:
+    rankdata[0] = data
+
 # Each rank can have different clocks (compute node), but we want to use the
 # same delta times range for comparisons, so we suck it up and take the hit of
 # precalculating this, unless the user knows better.
 delta_t = delta_t * CPU_CLOCK
 if delta_t == 0:
     for rank in ranks:
-        if mpimode:
-            data = sdata[sdata[:, rankcol] == rank]
-            full_step = data[0, :]
+        full_step = rankdata[rank][0, :]
 
         #  Start and end times for this rank. Can be changed using the mintic
         #  option. This moves our zero time to other time. Useful for
@@ -411,25 +471,24 @@ if delta_t == 0:
         dt = toc_step - tic_step
         if dt > delta_t:
             delta_t = dt
-    print(("# Data range: ", delta_t / CPU_CLOCK, "ms"))
+    print("# Data range: ", delta_t / CPU_CLOCK, "ms")
 
 # Once more doing the real gather and plots this time.
 for rank in ranks:
-    print(("# Processing rank: ", rank))
-    if mpimode:
-        data = sdata[sdata[:, rankcol] == rank]
-        full_step = data[0, :]
+    print("# Processing rank: ", rank)
+    data = rankdata[rank]
+    full_step = data[0, :]
     tic_step = int(full_step[ticcol])
     toc_step = int(full_step[toccol])
-    print(("# Min tic = ", tic_step))
+    print("# Min tic = ", tic_step)
     data = data[1:, :]
     typesseen = []
     nethread = 0
 
     #  Dummy image for ranks that have no tasks.
     if data.size == 0:
-        print(("# Rank ", rank, " has no tasks"))
-        fig = pl.figure()
+        print("# Rank ", rank, " has no tasks")
+        fig = plt.figure()
         ax = fig.add_subplot(1, 1, 1)
         ax.set_xlim(-delta_t * 0.01 / CPU_CLOCK, delta_t * 1.01 / CPU_CLOCK)
         if nthread == 0:
@@ -447,84 +506,70 @@ for rank in ranks:
             start_t = float(tic_step)
         else:
             start_t = float(mintic)
-        data[:, ticcol] -= start_t
-        data[:, toccol] -= start_t
         end_t = (toc_step - start_t) / CPU_CLOCK
 
-        tasks = {}
-        tasks[-1] = []
-        for i in range(nthread * expand):
-            tasks[i] = []
-
-        # Counters for each thread when expanding.
-        ecounter = []
-        for i in range(nthread):
-            ecounter.append(0)
-
-        num_lines = pl.shape(data)[0]
-        for line in range(num_lines):
-            thread = int(data[line, threadscol])
-
-            # Expand to cover extra lines if expanding.
-            ethread = thread * expand + (ecounter[thread] % expand)
-            ecounter[thread] = ecounter[thread] + 1
-            thread = ethread
-
-            tasks[thread].append({})
-            tasktype = TASKTYPES[int(data[line, taskcol])]
-            subtype = SUBTYPES[int(data[line, subtaskcol])]
-            tasks[thread][-1]["type"] = tasktype
-            tasks[thread][-1]["subtype"] = subtype
-            tic = int(data[line, ticcol]) / CPU_CLOCK
-            toc = int(data[line, toccol]) / CPU_CLOCK
-            tasks[thread][-1]["tic"] = tic
-            tasks[thread][-1]["toc"] = toc
-            if ("fof" in tasktype):
-                tasks[thread][-1]["colour"] = TASKCOLOURS[tasktype]
-            elif(
-                 "self" in tasktype
-                 or "pair" in tasktype
-                 or "recv" in tasktype
-                 or "send" in tasktype
-            ):
-                fulltype = tasktype + "/" + subtype
-                if fulltype in SUBCOLOURS:
-                    tasks[thread][-1]["colour"] = SUBCOLOURS[fulltype]
-                else:
-                    tasks[thread][-1]["colour"] = SUBCOLOURS[subtype]
-            else:
-                tasks[thread][-1]["colour"] = TASKCOLOURS[tasktype]
+        #  Colours, start times and durations of all the tasks. The rank's
+        #  rows are a view into the shared data, so the start times are
+        #  shifted into new arrays rather than in place.
+        tasktypes = data[:, taskcol].astype(int)
+        subtypes = data[:, subtaskcol].astype(int)
+        colourids = TYPECOLOURIDS[tasktypes, subtypes]
+        tics = (data[:, ticcol] - start_t) / CPU_CLOCK
+        widths = (data[:, toccol] - data[:, ticcol]) / CPU_CLOCK
+
+        # Expand to cover extra lines if expanding. The tasks of each thread
+        # are dealt out in turn over its lines, in the order they were read,
+        # so we need the count of each task within its thread.
+        threads = data[:, threadscol].astype(int)
+        bythread = np.argsort(threads, kind="stable")
+        counts = np.bincount(threads, minlength=nthread)
+        starts = np.cumsum(counts) - counts
+        ecounter = np.empty(threads.size, dtype=int)
+        ecounter[bythread] = np.arange(threads.size) - np.repeat(starts, counts)
+        ethreads = threads * expand + ecounter % expand
 
         # Use expanded threads from now on.
         nethread = nthread * expand
 
+        #  Legend support, collections don't add to this. Labels are added
+        #  in the order that their tasks are first plotted.
+        order = np.argsort(ethreads, kind="stable")
+        typeids = tasktypes[order] * len(SUBTYPES) + subtypes[order]
+        typeids, first = np.unique(typeids, return_index=True)
+        typeids = typeids[np.argsort(first)]
+
         typesseen = []
-        fig = pl.figure()
+        fig = plt.figure()
         ax = fig.add_subplot(1, 1, 1)
         ax.set_xlim(-delta_t * 0.01 / CPU_CLOCK, delta_t * 1.01 / CPU_CLOCK)
         ax.set_ylim(0.5, nethread + 1.0)
-        for i in range(nethread):
-
-            #  Collect ranges and colours into arrays.
-            tictocs = []
-            colours = []
-            j = 0
-            for task in tasks[i]:
-                tictocs.append((task["tic"], task["toc"] - task["tic"]))
-                colours.append(task["colour"])
-
-                #  Legend support, collections don't add to this.
-                if task["subtype"] != "none":
-                    qtask = task["type"] + "/" + task["subtype"]
-                else:
-                    qtask = task["type"]
-
-                if qtask not in typesseen:
-                    pl.plot([], [], color=task["colour"], label=qtask)
-                    typesseen.append(qtask)
-
-            #  Now plot.
-            ax.broken_barh(tictocs, [i + 0.55, 0.9], facecolors=colours, linewidth=0)
+        for typeid in typeids:
+            tasktype, subtype = divmod(typeid, len(SUBTYPES))
+            qtask = TYPELABELS[tasktype, subtype]
+            plt.plot([], [], color=TYPECOLOURS[tasktype, subtype], label=qtask)
+            typesseen.append(qtask)
+
+        #  Corners of the bar of every task. Single precision is plenty for
+        #  the rendered output and halves the data transformed for drawing.
+        bottoms = ethreads + 0.55
+        tops = bottoms + 0.9
+        tocs = tics + widths
+        verts = np.empty((tics.size, 4, 2), dtype=np.float32)
+        verts[:, 0, 0] = tics
+        verts[:, 0, 1] = bottoms
+        verts[:, 1, 0] = tics
+        verts[:, 1, 1] = tops
+        verts[:, 2, 0] = tocs
+        verts[:, 2, 1] = tops
+        verts[:, 3, 0] = tocs
+        verts[:, 3, 1] = bottoms
+
+        #  Now plot, all the bars of the rank as a single collection.
+        ax.add_collection(
+            collections.PolyCollection(
+                verts, facecolors=COLOURRGBAS[colourids], linewidth=0
+            )
+        )
 
     #  Legend and room for it.
     nrow = len(typesseen) / 8
@@ -553,18 +598,18 @@ for rank in ranks:
         ax.set_ylabel("Thread ID")
     else:
         ax.set_ylabel("Thread ID * " + str(expand))
-    ax.set_yticks(pl.array(list(range(nethread))), True)
+    ax.set_yticks(np.arange(nethread), minor=True)
 
     loc = plticker.MultipleLocator(base=expand)
     ax.yaxis.set_major_locator(loc)
     ax.grid(True, which="major", axis="y", linestyle="-")
 
-    pl.show()
+    plt.show()
     if mpimode:
         outpng = outbase + str(rank) + ".png"
     else:
         outpng = outbase + ".png"
-    pl.savefig(outpng, bbox_inches="tight")
-    print(("Graphics done, output written to", outpng))
+    plt.savefig(outpng, bbox_inches="tight")
+    print("Graphics done, output written to", outpng)
 
 sys.exit(0)